@@ -0,0 +1,469 @@
+"""
+Banco de pruebas de rendimiento del generador de identidades.
+
+Mide, para cada país de `direct_locales`, el arranque en frío (creación del
+Faker y primera identidad), la latencia en caliente de cada sección y de la
+identidad completa, el ahorro de cada selección de campos (FieldProjection)
+y del modo relacional (EntityPools), la serialización JSON (compacta e
+indentada) y la escritura a fichero. Los resultados se guardan en JSON para
+compararlos entre commits:
+
+    python benchmark.py --output base.json
+    python benchmark.py --compare base.json
+
+También comprueba que las reservas de valores (--reservoir) sirven valores
+con la misma distribución que las llamadas directas a Faker; si no, sale con 1.
+"""
+
+import argparse
+import collections
+import importlib.util
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+
+from FakeFace import (ColumnarWriter, CustomJSONEncoder, EntityPools, FakerPool, IdentityEngine,
+                      JSONLinesWriter, ValueReservoir)
+
+# Instante fijo para que todas las ejecuciones generen los mismos datos
+REFERENCE_TIME = datetime(2024, 1, 1)
+
+# Métricas usadas al comparar: la mediana es mucho más estable que la media o el p95
+COMPARED = ('p50_us', 'frio_ms', 'por_identidad_us', 'mb_por_segundo', 'identidades_por_segundo')
+
+# Selecciones de campos típicas para medir su ahorro
+PROJECTIONS = {
+    "nombre_email": ['datos_personales.nombre_completo', 'datos_contacto.email.personal'],
+    "puesto": ['datos_empleo.puesto.título'],
+    "direccion": ['datos_contacto.dirección'],
+    "usuario_tarjeta": ['datos_internet.credenciales.usuario',
+                        'datos_financieros.tarjetas_crédito.número']
+}
+
+# Grupos de secciones en los que se compara la generación vectorizada con la escalar
+VECTORIZED_SECTIONS = {
+    "fisicos_rasgos": ['datos_fisicos', 'datos_rasgos'],
+    "financieros_vehiculo": ['datos_financieros', 'datos_vehiculo'],
+    "completa": list(IdentityEngine.SECTIONS)
+}
+
+
+def timed(func, iterations, warmup=5):
+    """Ejecutar `func` varias veces y devolver la duración de cada llamada en segundos"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    """Resumir duraciones en microsegundos y llamadas por segundo"""
+    samples = sorted(samples)
+    mean = statistics.fmean(samples)
+    return {
+        "media_us": round(mean * 1e6, 2),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 2),
+        "p95_us": round(samples[int(len(samples) * 0.95)] * 1e6, 2),
+        "por_segundo": round(1 / mean, 1) if mean else None
+    }
+
+
+def bench_locale(country, iterations):
+    """
+    Medir un país: arranque en frío y latencia en caliente por sección.
+
+    Cada país usa una reserva de Faker propia para que el arranque en frío
+    incluya la creación de su Faker. La semilla se fija entre la creación y
+    la primera identidad y su coste se mide aparte, fuera del arranque.
+    """
+    pool = FakerPool()
+    engine = IdentityEngine(country=country, faker_pool=pool)
+    engine.reference_time = REFERENCE_TIME
+
+    start = time.perf_counter()
+    engine.get_country_faker()
+    loaded = time.perf_counter()
+    engine.seed(0)
+    seeded = time.perf_counter()
+    engine.generate()
+    cold_ms = (time.perf_counter() - seeded + loaded - start) * 1e3
+    load_s = sum(stats["carga_s"] for stats in pool.stats()["locales"].values())
+
+    fake = engine.get_country_faker()
+    gender = engine.gender
+    birth_date = engine.generate_birth_date(engine.age_range)
+    generators = engine.section_generators(fake, gender, birth_date)
+    generators['identificación'] = lambda: engine.generate_id_number(fake, gender)
+
+    result = {
+        "locale": engine.locale,
+        "frio_ms": round(cold_ms, 2),
+        "carga_faker_ms": round(load_s * 1e3, 2),
+        "semilla_ms": round((seeded - loaded) * 1e3, 3),
+        "secciones": {key: summarize(timed(generator, iterations))
+                      for key, generator in generators.items()},
+        "identidad": summarize(timed(engine.generate, iterations))
+    }
+    engine.close()
+    return result
+
+
+def bench_projections(country, iterations):
+    """
+    Medir cada selección de PROJECTIONS.
+
+    El ahorro se calcula sobre la mediana de la identidad completa y sobre la
+    de las secciones que contienen los campos, que es lo mínimo que se podía
+    pedir seleccionando secciones.
+    """
+    engine = IdentityEngine(country=country)
+    engine.reference_time = REFERENCE_TIME
+    engine.seed(0)
+    full = statistics.median(timed(engine.generate, iterations))
+
+    results = {}
+    for name, paths in PROJECTIONS.items():
+        engine.configure(fields=paths)
+        projected = statistics.median(timed(engine.generate, iterations))
+        engine.configure(sections=engine.sections)
+        sections = statistics.median(timed(engine.generate, iterations))
+        results[name] = {
+            "campos": paths,
+            "p50_us": round(projected * 1e6, 2),
+            "identidades_por_segundo": round(1 / projected, 1),
+            "ahorro_vs_completa": round(1 - projected / full, 3),
+            "ahorro_vs_secciones": round(1 - projected / sections, 3)
+        }
+    engine.close()
+    return results
+
+
+def bench_relational(country, iterations):
+    """
+    Medir la identidad del modo relacional, que apunta a reservas de
+    entidades en lugar de inventar empresas, bancos, aseguradora y dirección.
+    """
+    engines = {
+        "completa": IdentityEngine(country=country),
+        "relacional": IdentityEngine(country=country, schema=EntityPools.link_schema(),
+                                     pools=EntityPools.for_count(100_000))
+    }
+    results = {}
+    for name, engine in engines.items():
+        engine.reference_time = REFERENCE_TIME
+        engine.seed(0)
+        results[name] = summarize(timed(engine.generate, iterations))
+        engine.close()
+    completa, relacional = results["completa"]["p50_us"], results["relacional"]["p50_us"]
+    results["ahorro"] = round(1 - relacional / completa, 3)
+    return results
+
+
+def bench_vectorized(country, count, repeats=3):
+    """
+    Medir la generación vectorizada (--vectorized) frente a la escalar.
+
+    Cada grupo de VECTORIZED_SECTIONS genera `count` identidades hasta el
+    texto JSON Lines por las dos vías, con la misma semilla; de cada vía se
+    guarda la mejor de `repeats` ejecuciones. Devuelve None sin NumPy.
+    """
+    if importlib.util.find_spec('numpy') is None:
+        return None
+    results = {}
+    for name, sections in VECTORIZED_SECTIONS.items():
+        engine = IdentityEngine(country=country, sections=sections)
+        engine.reference_time = REFERENCE_TIME
+        paths = {
+            "escalar": lambda: ''.join(JSONLinesWriter.encode(identity) + '\n'
+                                       for identity in engine.generate_batch(count)),
+            "vectorizada": lambda: ''.join(rows.to_jsonl()
+                                           for rows in engine.generate_vectorized(count))
+        }
+        result = {}
+        for path, produce in paths.items():
+            engine.seed(0)
+            list(engine.generate_batch(10, vectorized=path == "vectorizada"))
+            best = None
+            for _ in range(repeats):
+                engine.seed(0)
+                start = time.perf_counter()
+                produce()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            result[path] = {"identidades_por_segundo": round(count / best, 1)}
+        result["aceleracion"] = round(result["vectorizada"]["identidades_por_segundo"]
+                                      / result["escalar"]["identidades_por_segundo"], 2)
+        results[name] = result
+        engine.close()
+    return results
+
+
+def wait_filled(engine, timeout=30):
+    """Esperar a que la reserva del locale actual esté llena; devolverla"""
+    reservoir = engine.get_reservoir()
+    full = reservoir.size * len(ValueReservoir.PROVIDERS)
+    deadline = time.monotonic() + timeout
+    while reservoir.stats()["en_reserva"] < full and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return reservoir
+
+
+def total_variation(first, second):
+    """Distancia de variación total entre las frecuencias de dos muestras del mismo tamaño"""
+    first, second = collections.Counter(first), collections.Counter(second)
+    return sum(abs(first[value] - second[value]) for value in first.keys() | second.keys()) \
+        / (2 * sum(first.values()))
+
+
+def bench_reservoirs(country, count, repeats=3):
+    """
+    Medir las reservas de valores (--reservoir) y comprobar su distribución.
+
+    Ritmo: `count` identidades sin reservas, con un hilo y con un proceso de
+    relleno, con las reservas ya llenas al empezar; de cada modo se guarda la
+    mejor de `repeats` ejecuciones. El relleno se mide dentro del tiempo.
+
+    Distribución: para cada proveedor de ValueReservoir.PROVIDERS se sacan
+    `count` valores de la reserva y `count` de llamadas directas a Faker, y se
+    compara su distancia de variación total con la de dos muestras directas
+    independientes. La reserva coincide si no se aleja más que el ruido de
+    muestreo (la referencia más 3/sqrt(count)).
+    """
+    results = {"modos": {}, "distribucion": {}}
+    for mode in (None, 'thread', 'process'):
+        engine = IdentityEngine(country=country)
+        engine.reference_time = REFERENCE_TIME
+        if mode is not None:
+            engine.enable_reservoirs(mode)
+            wait_filled(engine)
+        engine.generate()
+        best = None
+        for _ in range(repeats):
+            if mode is not None:
+                wait_filled(engine)
+            start = time.perf_counter()
+            for _ in range(count):
+                engine.generate()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results["modos"][mode or "sin_reserva"] = {"identidades_por_segundo": round(count / best, 1)}
+        engine.close()
+
+    engine = IdentityEngine(country=country)
+    engine.enable_reservoirs('thread')
+    reservoir = wait_filled(engine)
+    pooled = engine.generation_faker()
+    direct = engine.get_country_faker()
+    tolerance = 3 / count ** 0.5
+    for provider in ValueReservoir.PROVIDERS:
+        served = [getattr(pooled, provider)() for _ in range(count)]
+        first = [getattr(direct, provider)() for _ in range(count)]
+        second = [getattr(direct, provider)() for _ in range(count)]
+        distance = total_variation(served, first)
+        reference = total_variation(second, first)
+        results["distribucion"][provider] = {
+            "distancia": round(distance, 3),
+            "referencia": round(reference, 3),
+            "coincide": distance <= reference + tolerance
+        }
+    results["distribucion_aciertos"] = reservoir.stats()["aciertos"]
+    engine.close()
+    sin_reserva = results["modos"]["sin_reserva"]["identidades_por_segundo"]
+    for mode in ('thread', 'process'):
+        result = results["modos"][mode]
+        result["aceleracion"] = round(result["identidades_por_segundo"] / sin_reserva, 2)
+    return results
+
+
+def bench_serialization(identities):
+    """Medir la serialización compacta (JSON Lines) e indentada (GUI y guardado)"""
+    encoders = {
+        "compacto": JSONLinesWriter.encode,
+        "indentado": lambda identity: json.dumps(identity, indent=4, ensure_ascii=False,
+                                                 cls=CustomJSONEncoder)
+    }
+    results = {}
+    for name, encode in encoders.items():
+        start = time.perf_counter()
+        size = sum(len(encode(identity).encode('utf-8')) for identity in identities)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "por_identidad_us": round(elapsed / len(identities) * 1e6, 2),
+            "mb_por_segundo": round(size / elapsed / 1e6, 2),
+            "bytes_por_identidad": round(size / len(identities))
+        }
+    return results
+
+
+def bench_output(identities):
+    """Medir la escritura a fichero en JSON Lines y en los formatos columnares disponibles"""
+    writers = {
+        "jsonl": lambda directory: JSONLinesWriter(Path(directory) / "out.jsonl", append=False),
+        "csv": lambda directory: ColumnarWriter(Path(directory) / "csv", 'csv')
+    }
+    if importlib.util.find_spec('pyarrow') is not None:
+        for fmt in ('parquet', 'arrow'):
+            writers[fmt] = lambda directory, fmt=fmt: ColumnarWriter(Path(directory) / fmt, fmt)
+
+    results = {}
+    for name, create in writers.items():
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            with create(directory) as writer:
+                for identity in identities:
+                    writer.write(identity)
+            elapsed = time.perf_counter() - start
+            size = sum(path.stat().st_size for path in Path(directory).rglob('*') if path.is_file())
+        results[name] = {
+            "identidades_por_segundo": round(len(identities) / elapsed, 1),
+            "bytes_por_identidad": round(size / len(identities))
+        }
+    return results
+
+
+def environment():
+    """Datos del entorno para saber qué se está comparando"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "faker": metadata.version('faker'),
+        "plataforma": platform.platform()
+    }
+
+
+def run(countries, iterations, sample_size):
+    """Ejecutar todas las mediciones y devolver los resultados"""
+    results = {"entorno": environment(), "iteraciones": iterations, "locales": {}}
+    for country in countries:
+        results["locales"][country] = bench_locale(country, iterations)
+        print(f"{country}: {results['locales'][country]['identidad']['por_segundo']} id/s",
+              file=sys.stderr)
+
+    results["proyecciones"] = bench_projections(countries[0], iterations)
+    for name, result in results["proyecciones"].items():
+        print(f"{name}: {result['ahorro_vs_completa']:.0%} menos que la identidad completa, "
+              f"{result['ahorro_vs_secciones']:.0%} menos que sus secciones", file=sys.stderr)
+
+    results["relacional"] = bench_relational(countries[0], iterations)
+    print(f"relacional: {results['relacional']['ahorro']:.0%} menos que la identidad completa",
+          file=sys.stderr)
+
+    results["vectorizada"] = bench_vectorized(countries[0], sample_size)
+    for name, result in (results["vectorizada"] or {}).items():
+        print(f"vectorizada {name}: x{result['aceleracion']:.1f} "
+              f"({result['vectorizada']['identidades_por_segundo']:.0f} id/s)", file=sys.stderr)
+
+    results["reservas"] = bench_reservoirs(countries[0], sample_size)
+    for mode in ('thread', 'process'):
+        print(f"reservas {mode}: x{results['reservas']['modos'][mode]['aceleracion']:.2f}",
+              file=sys.stderr)
+    for provider, result in results["reservas"]["distribucion"].items():
+        if not result["coincide"]:
+            print(f"reservas: la distribución de {provider} no coincide con Faker "
+                  f"({result['distancia']} frente a {result['referencia']})", file=sys.stderr)
+
+    engine = IdentityEngine()
+    engine.reference_time = REFERENCE_TIME
+    engine.seed(0)
+    identities = list(engine.generate_batch(sample_size))
+    results["serializacion"] = bench_serialization(identities)
+    results["salida"] = bench_output(identities)
+    return results
+
+
+def flatten(results, prefix=''):
+    """Aplanar los resultados en {ruta: valor} para compararlos"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '/'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline, threshold):
+    """
+    Comparar dos resultados e informar de las métricas que cambian más que `threshold`.
+
+    Solo se comparan las métricas de COMPARED. En las de tiempo (_us, _ms) un
+    aumento es una regresión; en las de ritmo (por_segundo) lo es una disminución.
+
+    Returns:
+        int: Número de regresiones
+    """
+    current, baseline = flatten(current), flatten(baseline)
+    regressions = 0
+    for path in sorted(current.keys() & baseline.keys()):
+        old, new = baseline[path], current[path]
+        if not path.endswith(COMPARED) or not old:
+            continue
+        lower_is_better = path.endswith(('_us', '_ms'))
+        change = (new - old) / old
+        if abs(change) < threshold:
+            continue
+        worse = change > 0 if lower_is_better else change < 0
+        regressions += worse
+        print(f"{'REGRESIÓN' if worse else 'mejora':9} {path}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de FakeFace")
+    parser.add_argument('--countries', help="Países a medir separados por comas "
+                                            "(por defecto todos los de direct_locales)")
+    parser.add_argument('--iterations', type=int, default=200,
+                        help="Llamadas por sección e identidad en cada país")
+    parser.add_argument('--sample', type=int, default=2000,
+                        help="Identidades para medir serialización y escritura")
+    parser.add_argument('--quick', action='store_true',
+                        help="Pocas iteraciones y solo tres países, para comprobaciones rápidas")
+    parser.add_argument('--output', help="Guardar los resultados en este fichero JSON")
+    parser.add_argument('--compare', metavar='BASE',
+                        help="Comparar con unos resultados anteriores; sale con 1 si hay regresiones")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Cambio relativo mínimo para informar en --compare")
+    args = parser.parse_args(argv)
+
+    countries = list(IdentityEngine().direct_locales)
+    if args.countries:
+        countries = [country.strip() for country in args.countries.split(',')]
+    iterations, sample_size = args.iterations, args.sample
+    if args.quick:
+        countries = countries if args.countries else ['España', 'Estados Unidos', 'Japón']
+        iterations, sample_size = 30, 300
+
+    results = run(countries, iterations, sample_size)
+    text = json.dumps(results, ensure_ascii=False, indent=4)
+    if args.output:
+        Path(args.output).write_text(text, encoding='utf-8')
+    else:
+        print(text)
+
+    mismatched = not all(result["coincide"] for result in results["reservas"]["distribucion"].values())
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        return 1 if compare(results, baseline, args.threshold) or mismatched else 0
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())